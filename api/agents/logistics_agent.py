@@ -7,12 +7,19 @@ for the shipping logistics demo backed by v2 Responses API.
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import re
+import threading
 from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from textwrap import dedent
-from typing import Annotated
+from types import MappingProxyType
+from typing import Annotated, Mapping
 
 from agent_framework import ChatAgent, ChatClientProtocol, ai_function
 from agent_framework_ag_ui import AgentFrameworkAgent
@@ -42,24 +49,54 @@ def _load_flight_data() -> dict:
 
 # Module-level cache for flight data
 _FLIGHT_DATA: dict = {}
+_FLIGHT_DATA_LOCK = threading.Lock()
 
 def _get_flight_data() -> dict:
     """Get cached flight data, loading if necessary."""
     if not _FLIGHT_DATA:
-        _FLIGHT_DATA.update(_load_flight_data())
+        # Double-checked so parallel tool calls (each in its own worker thread) parse the file only once
+        with _FLIGHT_DATA_LOCK:
+            if not _FLIGHT_DATA:
+                _FLIGHT_DATA.update(_load_flight_data())
     return _FLIGHT_DATA
 
 def _get_all_flights() -> list[dict]:
     """Get all flights from the data file."""
     return _get_flight_data().get("flights", [])
 
-def _get_historical_data() -> list[dict]:
-    """Get historical data from the data file."""
-    return _get_flight_data().get("historicalData", [])
+async def _aget_flight_data() -> dict:
+    """Async variant of _get_flight_data for the read-only get_* tools.
+
+    The first load reads the JSON file in a worker thread so it doesn't block the
+    event loop. Once the data is cached this returns without awaiting anything.
+    """
+    if not _FLIGHT_DATA:
+        await asyncio.to_thread(_get_flight_data)
+    return _FLIGHT_DATA
+
+# Risk-level groupings used by the get_* tools
+_OVER_UTILIZED_RISKS = frozenset({"high", "critical"})
+_UNDER_UTILIZED_RISKS = frozenset({"low"})
+_OPTIMAL_RISKS = frozenset({"medium"})
+_UTILIZATION_RISKS = frozenset({"low", "high", "critical"})
+
+@lru_cache(maxsize=64)
+def _cached_flight_batch(risk_levels: frozenset[str] | None, count: int) -> tuple[dict, ...]:
+    """Get the first `count` flights whose riskLevel is in `risk_levels` (all flights if None).
+
+    Flight data is static, so repeated tool calls with the same arguments reuse the
+    same batch. Callers get a fresh list of shared flight dicts and must not mutate them.
+    """
+    flights = _get_all_flights()
+    if risk_levels is not None:
+        flights = [f for f in flights if f.get("riskLevel") in risk_levels]
+    return tuple(flights[:count])
 
 
 # State schema for the logistics agent
-STATE_SCHEMA: dict[str, object] = {
+# Exposed as read-only views so the shared module-level config can't be mutated
+# by callers; create_logistics_agent hands the framework its own dict copy.
+STATE_SCHEMA: Mapping[str, object] = MappingProxyType({
     "flights": {
         "type": "array",
         "items": {
@@ -128,9 +165,9 @@ STATE_SCHEMA: dict[str, object] = {
         "type": "number",
         "description": "Maximum number of flights to display in the dashboard (5, 10, 15, or 20).",
     },
-}
+})
 
-PREDICT_STATE_CONFIG: dict[str, dict[str, str]] = {
+PREDICT_STATE_CONFIG: Mapping[str, dict[str, str]] = MappingProxyType({
     # Map update tools to state - these tools' arguments are extracted and used to update UI state
     "flights": {
         "tool": "update_flights",
@@ -149,7 +186,7 @@ PREDICT_STATE_CONFIG: dict[str, dict[str, str]] = {
         "tool": "fetch_flights",
         "tool_argument": "activeFilter",
     },
-}
+})
 
 
 # Tool definitions
@@ -194,8 +231,13 @@ def update_historical_data(
     ],
 ) -> str:
     """Update the historical chart data."""
-    predicted_count = sum(1 for d in historical_data if d.get("predicted", False))
-    historical_count = len(historical_data) - predicted_count
+    predicted_count = 0
+    historical_count = 0
+    for d in historical_data:
+        if d.get("predicted", False):
+            predicted_count += 1
+        else:
+            historical_count += 1
     return f"Chart updated with {historical_count} historical and {predicted_count} predicted data points."
 
 
@@ -324,17 +366,16 @@ def clear_filter(
     name="get_over_utilized_flights",
     description="Get the top N over-utilized flights (utilization > 85%) for the next sort time. This updates the dashboard display automatically.",
 )
-def get_over_utilized_flights(
+async def get_over_utilized_flights(
     count: Annotated[
         int,
         Field(description="Number of flights to return.", default=10),
     ] = 10,
 ) -> dict:
     """Retrieve over-utilized flights and return structured data for state update."""
-    all_flights = _get_all_flights()
-    # Filter for over-utilized flights (high or critical risk level)
-    over_utilized = [f for f in all_flights if f.get("riskLevel") in ["high", "critical"]]
-    flights = over_utilized[:count]
+    await _aget_flight_data()
+    # Over-utilized flights are those at high or critical risk level
+    flights = list(_cached_flight_batch(_OVER_UTILIZED_RISKS, count))
     return {
         "message": f"Found {len(flights)} over-utilized flights. The dashboard has been updated.",
         "flights": flights,
@@ -345,17 +386,16 @@ def get_over_utilized_flights(
     name="get_under_utilized_flights",
     description="Get the top N under-utilized flights (utilization < 50%) for the next sort time. This updates the dashboard display automatically.",
 )
-def get_under_utilized_flights(
+async def get_under_utilized_flights(
     count: Annotated[
         int,
         Field(description="Number of flights to return.", default=10),
     ] = 10,
 ) -> dict:
     """Retrieve under-utilized flights and return structured data for state update."""
-    all_flights = _get_all_flights()
-    # Filter for under-utilized flights (low risk level)
-    under_utilized = [f for f in all_flights if f.get("riskLevel") == "low"]
-    flights = under_utilized[:count]
+    await _aget_flight_data()
+    # Under-utilized flights are those at low risk level
+    flights = list(_cached_flight_batch(_UNDER_UTILIZED_RISKS, count))
     return {
         "message": f"Found {len(flights)} under-utilized flights. The dashboard has been updated.",
         "flights": flights,
@@ -366,17 +406,16 @@ def get_under_utilized_flights(
     name="get_optimal_flights",
     description="Get flights with optimal utilization (50-80% capacity). These are well-balanced flights that don't need adjustment. This updates the dashboard display automatically.",
 )
-def get_optimal_flights(
+async def get_optimal_flights(
     count: Annotated[
         int,
         Field(description="Number of flights to return.", default=10),
     ] = 10,
 ) -> dict:
     """Retrieve optimally-utilized flights and return structured data for state update."""
-    all_flights = _get_all_flights()
-    # Filter for optimal flights (medium risk level = 50-80% utilization)
-    optimal = [f for f in all_flights if f.get("riskLevel") == "medium"]
-    flights = optimal[:count]
+    await _aget_flight_data()
+    # Optimal flights are those at medium risk level (50-80% utilization)
+    flights = list(_cached_flight_batch(_OPTIMAL_RISKS, count))
     return {
         "message": f"Found {len(flights)} optimally-utilized flights (50-80% capacity). The dashboard has been updated.",
         "flights": flights,
@@ -387,22 +426,26 @@ def get_optimal_flights(
     name="get_predicted_payload",
     description="Get predicted payload data for upcoming flights. This updates the dashboard display automatically.",
 )
-def get_predicted_payload(
+async def get_predicted_payload(
     count: Annotated[
         int,
         Field(description="Number of flights to return.", default=10),
     ] = 10,
 ) -> dict:
     """Retrieve predicted payload for upcoming flights and return structured data."""
-    all_flights = _get_all_flights()
+    await _aget_flight_data()
     # Return a mix of flights for predicted payload view
-    flights = all_flights[:count]
+    flights = list(_cached_flight_batch(None, count))
     return {
         "message": f"Predicted payload for {len(flights)} upcoming flights. The dashboard has been updated.",
         "flights": flights,
     }
 
 
+# Flight numbers look like "LAX-ORD-2847"; only the route prefix is matched, so route-only lookups work too
+_FLIGHT_NUMBER_RE = re.compile(r"\s*([A-Za-z]{3})\s*-\s*([A-Za-z]{3})")
+
+
 @ai_function(
     name="get_flight_details",
     description="Get detailed payload information for a specific flight by flight number. This updates the dashboard to show the flight detail card.",
@@ -428,10 +471,10 @@ def get_flight_details(
             }
     
     # If not found, return the first flight with matching route pattern
-    parts = search_number.split("-")
-    if len(parts) >= 2:
-        from_code = parts[0]
-        to_code = parts[1]
+    match = _FLIGHT_NUMBER_RE.match(flight_number)
+    if match:
+        from_code = match.group(1).upper()
+        to_code = match.group(2).upper()
         for flight in all_flights:
             if flight.get("from") == from_code and flight.get("to") == to_code:
                 return {
@@ -452,6 +495,10 @@ def get_flight_details(
     }
 
 
+# ISO-8601 UTC timestamp format for recommendation cards
+_GENERATED_AT_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
 def _get_flight_by_id_or_number(identifier: str) -> dict | None:
     """Helper to find a flight by ID or flight number."""
     all_flights = _get_all_flights()
@@ -474,8 +521,6 @@ def show_risk_recommendations(
     ] = None,
 ) -> dict:
     """Generate and return recommendations for a flight. Rendered as interactive card in chat."""
-    from datetime import datetime
-    
     # Determine which flight to analyze
     flight = None
     
@@ -499,6 +544,7 @@ def show_risk_recommendations(
     risk_level = flight.get("riskLevel", "medium")
     utilization = flight.get("utilizationPercent", 0)
     route = f"{flight.get('from', '?')} → {flight.get('to', '?')}"
+    generated_at = datetime.now(timezone.utc).strftime(_GENERATED_AT_FORMAT)
     
     # Generate recommendations based on risk level
     recommendations = []
@@ -561,7 +607,7 @@ def show_risk_recommendations(
             "utilizationPercent": utilization,
             "recommendations": [],
             "message": f"Flight {flight_number} is at optimal utilization ({utilization:.1f}%). No action needed.",
-            "generatedAt": datetime.utcnow().isoformat() + "Z",
+            "generatedAt": generated_at,
         }
     
     logger.info("[show_risk_recommendations] Generated %d recommendations for flight %s (%s risk)",
@@ -574,7 +620,7 @@ def show_risk_recommendations(
         "riskLevel": risk_level,
         "utilizationPercent": utilization,
         "recommendations": recommendations,
-        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "generatedAt": generated_at,
     }
 
 
@@ -832,17 +878,16 @@ def analyze_flights(
     name="get_utilization_risks",
     description="Get all flights with utilization risk (either over or under utilized). This updates the dashboard display automatically.",
 )
-def get_utilization_risks(
+async def get_utilization_risks(
     count: Annotated[
         int,
         Field(description="Number of risk flights to return.", default=15),
     ] = 15,
 ) -> dict:
     """Retrieve flights with utilization risks and return structured data."""
-    all_flights = _get_all_flights()
-    # Filter for flights with risk (not medium utilization)
-    risk_flights = [f for f in all_flights if f.get("riskLevel") != "medium"]
-    flights = risk_flights[:count]
+    await _aget_flight_data()
+    # Flights with risk are everything outside medium utilization
+    flights = list(_cached_flight_batch(_UTILIZATION_RISKS, count))
     
     over = [f for f in flights if f["riskLevel"] in ["high", "critical"]]
     under = [f for f in flights if f["riskLevel"] == "low"]
@@ -857,14 +902,14 @@ def get_utilization_risks(
     name="get_historical_payload",
     description="Get historical payload data and predictions for trend analysis. This updates the dashboard chart.",
 )
-def get_historical_payload(
+async def get_historical_payload(
     days: Annotated[
         int,
-        Field(description="Number of historical days to retrieve.", default=7),
+        Field(description="Number of historical days to retrieve.", default=7, ge=0),
     ] = 7,
     include_predictions: Annotated[
         int,
-        Field(description="Number of prediction days to include.", default=3),
+        Field(description="Number of prediction days to include.", default=3, ge=0),
     ] = 3,
     route: Annotated[
         str | None,
@@ -872,7 +917,7 @@ def get_historical_payload(
     ] = None,
 ) -> dict:
     """Retrieve historical and predicted payload data and return structured data."""
-    historical_data = _get_historical_data()
+    historical_data = (await _aget_flight_data()).get("historicalData", [])
     
     # If a route is specified, filter for that route
     if route:
@@ -882,18 +927,17 @@ def get_historical_payload(
         if matching_data:
             historical_data = matching_data
     
-    # Separate historical and predicted data
-    historical = [d for d in historical_data if not d.get("predicted", False)]
-    predictions = [d for d in historical_data if d.get("predicted", False)]
+    # Separate historical and predicted data, stopping once the requested counts are reached
+    historical = list(islice((d for d in historical_data if not d.get("predicted", False)), days))
+    predictions = list(islice((d for d in historical_data if d.get("predicted", False)), include_predictions))
     
-    # Limit to requested counts
-    result_data = historical[:days] + predictions[:include_predictions]
+    result_data = historical + predictions
     
-    historical_count = min(days, len(historical))
-    predicted_count = min(include_predictions, len(predictions))
+    historical_count = len(historical)
+    predicted_count = len(predictions)
     
     if historical:
-        avg_pounds = sum(d.get("pounds", 0) for d in historical[:days]) // max(1, historical_count)
+        avg_pounds = sum(d.get("pounds", 0) for d in historical) // max(1, historical_count)
     else:
         avg_pounds = 0
     
@@ -994,8 +1038,8 @@ def create_logistics_agent(chat_client: ChatClientProtocol) -> AgentFrameworkAge
         agent=base_agent,
         name="logistics_agent",
         description="Manages shipping logistics data, flight payloads, and utilization analysis.",
-        state_schema=STATE_SCHEMA,
-        predict_state_config=PREDICT_STATE_CONFIG,
+        state_schema=dict(STATE_SCHEMA),
+        predict_state_config=dict(PREDICT_STATE_CONFIG),
         require_confirmation=False,
         use_service_thread=False,
         orchestrators=[
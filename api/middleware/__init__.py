@@ -6,6 +6,8 @@ from .auth import (
     azure_ad_settings,
     azure_scheme,
     get_azure_auth_scheme,
+    get_jwks_client,
+    refresh_jwks_periodically,
 )
 from .responses_api import (
     ResponsesApiThreadMiddleware,
@@ -21,6 +23,8 @@ __all__ = [
     "azure_ad_settings",
     "azure_scheme",
     "get_azure_auth_scheme",
+    "get_jwks_client",
+    "refresh_jwks_periodically",
     # Responses API middleware
     "ResponsesApiThreadMiddleware",
     "get_thread_response_store",
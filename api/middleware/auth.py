@@ -5,9 +5,12 @@ This module sets up Azure AD token validation for the FastAPI backend.
 It validates JWT tokens issued by Azure AD and extracts user information.
 """
 
-from fastapi import Request, status
+import asyncio
+from functools import lru_cache
+
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 from fastapi_azure_auth import SingleTenantAzureAuthorizationCodeBearer
 from pydantic_settings import BaseSettings
 import jwt
@@ -43,7 +46,7 @@ azure_ad_settings = AzureADSettings()
 
 
 # Paths that don't require authentication
-PUBLIC_PATHS = {
+PUBLIC_PATHS = frozenset({
     "/",
     "/health",
     "/info",
@@ -51,21 +54,65 @@ PUBLIC_PATHS = {
     "/agent/info",
     "/logistics/info",
     "/docs",
+    "/oauth2-redirect",  # Swagger UI's OAuth callback page, loaded by the browser without a token
     "/openapi.json",
     "/redoc",
-}
+})
+
+
+# Azure AD signing keys rotate rarely, and PyJWKClient refetches the key set on an
+# unknown kid anyway, so keep the cached set for a day instead of PyJWT's 5 minutes
+JWKS_CACHE_SECONDS = 24 * 60 * 60
+
+# How often the lifespan task refetches the key set, well inside JWKS_CACHE_SECONDS
+# so requests never hit an expired cache and block on the fetch
+JWKS_REFRESH_INTERVAL_SECONDS = 60 * 60
+
+
+@lru_cache(maxsize=None)
+def get_jwks_client(tenant_id: str) -> PyJWKClient:
+    """Shared JWKS client for a tenant, so the middleware and the refresh task use one key cache."""
+    return PyJWKClient(
+        f"https://login.microsoftonline.com/{tenant_id}/discovery/v2.0/keys",
+        lifespan=JWKS_CACHE_SECONDS,
+    )
+
+
+async def refresh_jwks_periodically(tenant_id: str) -> None:
+    """Fetch the tenant's signing keys now, then keep them (and the OpenID config) warm until cancelled.
+    
+    The OpenID config is loaded by lifespan at startup, so this only refreshes it from
+    the second pass on. PyJWKClient fetches synchronously, so the key fetch runs in a
+    worker thread rather than stalling the event loop the way an expired cache would
+    on a request.
+    """
+    jwks_client = get_jwks_client(tenant_id)
+    first_pass = True
+    while True:
+        try:
+            await asyncio.to_thread(jwks_client.get_signing_keys, True)
+            if azure_scheme and not first_pass:
+                await azure_scheme.openid_config.load_config()
+        except Exception as e:
+            # Keep serving from the existing cache and try again next interval
+            logger.warning(f"Failed to refresh Azure AD signing keys: {e}")
+        first_pass = False
+        await asyncio.sleep(JWKS_REFRESH_INTERVAL_SECONDS)
 
 
-class AzureADAuthMiddleware(BaseHTTPMiddleware):
+class AzureADAuthMiddleware:
     """
     Middleware that validates Azure AD JWT tokens on all requests.
+    
+    Implemented as plain ASGI rather than BaseHTTPMiddleware: allowed requests go
+    straight to the app, so the streamed AG-UI responses aren't relayed through
+    call_next's extra task and memory stream.
     """
     
-    def __init__(self, app, settings: AzureADSettings):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, settings: AzureADSettings):
+        self.app = app
         self.settings = settings
-        self.jwks_uri = f"https://login.microsoftonline.com/{settings.AZURE_AD_TENANT_ID}/discovery/v2.0/keys"
-        self.jwks_client = PyJWKClient(self.jwks_uri) if settings.AZURE_AD_TENANT_ID else None
+        self.jwks_client = get_jwks_client(settings.AZURE_AD_TENANT_ID) if settings.AZURE_AD_TENANT_ID else None
         
         # Azure AD can issue tokens with different issuer formats depending on the endpoint
         self.valid_issuers = [
@@ -86,30 +133,50 @@ class AzureADAuthMiddleware(BaseHTTPMiddleware):
         logger.debug(f"Azure AD Auth configured with audiences: {self.valid_audiences}")
         logger.debug(f"Azure AD Auth configured with issuers: {self.valid_issuers}")
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Only HTTP requests carry bearer tokens; lifespan/websocket pass through
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        error_response = self._authenticate(scope)
+        if error_response is not None:
+            await error_response(scope, receive, send)
+            return
+        
+        await self.app(scope, receive, send)
+    
+    def _authenticate(self, scope: Scope) -> JSONResponse | None:
+        """Validate the request's bearer token.
+        
+        Returns the error response to send, or None if the request may proceed.
+        """
         # Normalize path by removing trailing slash for comparison
-        path = request.url.path.rstrip("/") or "/"
+        path = scope["path"].rstrip("/") or "/"
         
         # Skip auth for public paths
         if path in PUBLIC_PATHS:
-            return await call_next(request)
+            return None
         
         # Skip auth for OPTIONS requests (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
+        if scope["method"] == "OPTIONS":
+            return None
         
         # Skip if auth is explicitly disabled
         if self.settings.AUTH_DISABLED:
             logger.warning("Authentication is DISABLED via AUTH_DISABLED environment variable")
-            return await call_next(request)
+            return None
         
         # Skip if auth is not configured
         if not self.settings.AZURE_AD_CLIENT_ID or not self.settings.AZURE_AD_TENANT_ID:
             logger.warning("Azure AD auth not configured, allowing request without validation")
-            return await call_next(request)
+            return None
         
-        # Get the Authorization header
-        auth_header = request.headers.get("Authorization")
+        # Get the Authorization header (ASGI header names are already lower-cased)
+        auth_header = next(
+            (value.decode("latin-1") for key, value in scope["headers"] if key == b"authorization"),
+            None,
+        )
         if not auth_header:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -158,8 +225,8 @@ class AzureADAuthMiddleware(BaseHTTPMiddleware):
                 audience=self.valid_audiences,
                 issuer=self.valid_issuers,
             )
-            # Store user info in request state for downstream use
-            request.state.user = payload
+            # Store user info in request state for downstream use (request.state reads scope["state"])
+            scope.setdefault("state", {})["user"] = payload
         except jwt.ExpiredSignatureError:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -180,7 +247,7 @@ class AzureADAuthMiddleware(BaseHTTPMiddleware):
                 content={"detail": "Authentication error"},
             )
         
-        return await call_next(request)
+        return None
 
 
 def get_azure_auth_scheme() -> SingleTenantAzureAuthorizationCodeBearer:
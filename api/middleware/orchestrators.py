@@ -9,10 +9,81 @@ from __future__ import annotations
 
 import json
 import logging
+import math
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any
 
 from agent_framework_ag_ui._orchestrators import DefaultOrchestrator, Orchestrator, ExecutionContext
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup, falls back to stdlib json
+    orjson = None  # type: ignore[assignment]
+
+
+def _json_loads(data: str) -> Any:
+    """Parse JSON with orjson when installed, falling back to stdlib json.
+    
+    Anything orjson rejects (NaN literals, non-str input) goes through json.loads,
+    so invalid input raises the same errors as the stdlib.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+# Options for the orjson sanitizing round-trip. Datetimes and dataclasses are passed
+# through to default=str, as json.dumps does, rather than using orjson's native formats
+_ORJSON_SANITIZE_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson is not None
+    else 0
+)
+
+
+def _has_non_finite_float(value: Any) -> bool:
+    """True if a NaN or infinite float sits anywhere in nested dicts, lists or tuples."""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(v) for v in value)
+    return False
+
+
+def _looks_like_json_object(text: str) -> bool:
+    """Cheap pre-parse probe: True if the first non-whitespace character is '{'.
+    
+    Lets callers that only care about JSON objects skip plain text, arrays and empty
+    strings without paying for a raised JSONDecodeError.
+    """
+    head = text[:1]
+    if head.isspace():
+        head = text.lstrip()[:1]
+    return head == "{"
+
+
+# Placeholder the frontend/tools send for "leave this filter field unchanged"
+_KEEP_SENTINEL = "__KEEP__"
+
+
+def _strip_keep_sentinels(active_filter: dict) -> dict:
+    """Map __KEEP__ sentinel values to None.
+    
+    The filter dicts reaching the orchestrator are freshly parsed/sanitized copies,
+    so the common sentinel-free case returns the dict itself instead of rebuilding it.
+    """
+    if _KEEP_SENTINEL in active_filter.values():
+        return {k: (None if v == _KEEP_SENTINEL else v) for k, v in active_filter.items()}
+    return active_filter
+
 
 def sanitize_state(state: dict[str, Any] | None) -> dict[str, Any]:
     """Ensure state is JSON-serializable to avoid deepcopy issues with RLock objects.
@@ -25,6 +96,17 @@ def sanitize_state(state: dict[str, Any] | None) -> dict[str, Any]:
         return {}
     try:
         # Round-trip through JSON to ensure serializability
+        # orjson (when installed) does this in native code without the intermediate str. It
+        # rejects integers wider than 64 bits and writes NaN/Infinity as null, so states holding
+        # those take the stdlib path instead of being wiped or altered
+        if orjson is not None:
+            try:
+                data = orjson.dumps(state, default=str, option=_ORJSON_SANITIZE_OPTIONS)
+            except orjson.JSONEncodeError:
+                data = None
+            # Non-finite floats can only be present if orjson wrote a null somewhere
+            if data is not None and not (b"null" in data and _has_non_finite_float(state)):
+                return orjson.loads(data)
         return json.loads(json.dumps(state, default=str))
     except (TypeError, ValueError) as e:
         logging.getLogger(__name__).warning(
@@ -36,7 +118,7 @@ from ag_ui.core import (
     RunStartedEvent, RunFinishedEvent, MessagesSnapshotEvent,
     ToolCallStartEvent, ToolCallArgsEvent, ToolCallEndEvent, ToolCallResultEvent,
     TextMessageStartEvent, TextMessageContentEvent, TextMessageEndEvent,
-    StateSnapshotEvent,
+    StateSnapshotEvent, StateDeltaEvent,
 )
 
 from .responses_api import get_thread_response_store, get_current_agui_thread_id
@@ -46,7 +128,7 @@ logger = logging.getLogger(__name__)
 
 # Tools that are frontend-only (handled by CopilotKit, not backend)
 # These tools trigger REST API calls from the frontend, not SSE streaming
-FRONTEND_ONLY_TOOLS = {
+FRONTEND_ONLY_TOOLS = frozenset({
     "filter_dashboard",
     "setThemeColor",
     "display_flight_list",
@@ -57,15 +139,113 @@ FRONTEND_ONLY_TOOLS = {
     "reload_all_flights",
     # NOTE: fetch_flights is now a BACKEND tool that updates activeFilter state
     # The frontend reacts to state.activeFilter changes and fetches via REST
-}
+})
 
 # Frontend-only state fields that should be preserved from the incoming request
 # These fields are set by frontend actions (like filter_dashboard) and should NOT
 # be overwritten by the agent's state
 # Note: activeFilter is NOT here - it's now set by backend fetch_flights tool
-FRONTEND_ONLY_STATE_FIELDS = {
+FRONTEND_ONLY_STATE_FIELDS = frozenset({
     "selectedRoute",
-}
+})
+
+# How many inner event types a run keeps for its end-of-run DEBUG trace line
+_EVENT_TRACE_SIZE = 256
+
+
+@dataclass
+class _MessageIndex:
+    """Per-message views of a conversation, normalized once per request.
+    
+    roles[i] and contents[i] describe messages[i]: the lower-cased role value and
+    the message contents as a list. tool_related[i] is set for assistant messages
+    carrying a tool call or result (any content with a call_id counts), so content
+    types are tested once here rather than again in every filter.
+    frontend_call_ids holds the call IDs of frontend-only tool calls made by
+    assistant messages, and has_tool_activity is set if any message is a tool
+    result or a tool-related assistant message.
+    """
+    messages: list
+    roles: list[str]
+    contents: list[list]
+    tool_related: list[bool]
+    frontend_call_ids: frozenset[str]
+    has_tool_activity: bool
+
+
+def _role_of(msg: Any) -> str:
+    """Lower-cased role of a message - the role could be an enum-like object or a string."""
+    role = getattr(msg, 'role', None)
+    return (role.value if hasattr(role, 'value') else str(role) if role else 'unknown').lower()
+
+
+def _contents_of(msg: Any) -> list:
+    """Message contents as a list (AG-UI SDK uses 'contents' plural, some messages use 'content')."""
+    msg_contents = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
+    if not msg_contents:
+        return []
+    return msg_contents if isinstance(msg_contents, list) else [msg_contents]
+
+
+def _build_message_index(messages: list) -> _MessageIndex:
+    """Walk the message history once, normalizing roles and contents."""
+    roles: list[str] = []
+    contents_list: list[list] = []
+    tool_related_list: list[bool] = []
+    frontend_call_ids: set[str] = set()
+    has_tool_activity = False
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    
+    for msg in messages or ():
+        role_value = _role_of(msg)
+        contents = _contents_of(msg)
+        tool_related = False
+        
+        if role_value == 'tool':
+            has_tool_activity = True
+        elif role_value == 'assistant':
+            for c in contents:
+                if isinstance(c, FunctionCallContent):
+                    tool_related = True
+                    tool_name = c.name
+                    call_id = c.call_id
+                    if tool_name in FRONTEND_ONLY_TOOLS and call_id:
+                        frontend_call_ids.add(call_id)
+                        if debug_enabled:
+                            logger.debug("[DeduplicatingOrchestrator] Found frontend tool call: %s (id=%s)", tool_name, call_id[:12])
+                elif isinstance(c, FunctionResultContent) or getattr(c, 'call_id', None):
+                    tool_related = True
+            has_tool_activity = has_tool_activity or tool_related
+        
+        roles.append(role_value)
+        contents_list.append(contents)
+        tool_related_list.append(tool_related)
+    
+    return _MessageIndex(
+        messages=messages or [],
+        roles=roles,
+        contents=contents_list,
+        tool_related=tool_related_list,
+        frontend_call_ids=frozenset(frontend_call_ids),
+        has_tool_activity=has_tool_activity,
+    )
+
+
+@lru_cache(maxsize=512)
+def _normalize_route(route: str) -> str:
+    """Normalize a filter_dashboard route ("lax-ord", "LAX to ORD") like the frontend does."""
+    return route.upper().replace("-", " → ").replace(" TO ", " → ")
+
+
+@lru_cache(maxsize=1)
+def _agent_context_vars() -> tuple[ContextVar, ContextVar]:
+    """The (current_active_filter, current_selected_flight) ContextVars the agent tools read.
+    
+    agents.logistics_agent imports this package before it defines them, so they
+    can't be imported at module scope here; resolve them once on first use instead.
+    """
+    from agents.logistics_agent import current_active_filter, current_selected_flight
+    return current_active_filter, current_selected_flight
 
 
 class DeduplicatingOrchestrator(Orchestrator):
@@ -84,14 +264,18 @@ class DeduplicatingOrchestrator(Orchestrator):
     and emits StateSnapshotEvent to sync with the frontend.
     """
     
+    __slots__ = ("_inner", "_tool_args_buffer")
+    
     def __init__(self) -> None:
         self._inner = DefaultOrchestrator()
+        # Streamed argument deltas for in-flight filter_dashboard calls, keyed by tool_call_id
+        self._tool_args_buffer: dict[str, list[str]] = {}
     
     def can_handle(self, context: ExecutionContext) -> bool:
         """Delegate to inner orchestrator."""
         return self._inner.can_handle(context)
     
-    def _filter_frontend_tool_calls(self, context: ExecutionContext) -> None:
+    def _filter_frontend_tool_calls(self, context: ExecutionContext, index: _MessageIndex) -> _MessageIndex:
         """Filter messages to remove frontend-only tool calls and their results.
         
         Frontend-only tools (like filter_dashboard) are handled by CopilotKit locally
@@ -106,121 +290,117 @@ class DeduplicatingOrchestrator(Orchestrator):
         This is called UNCONDITIONALLY on every request because CopilotKit always
         sends the full conversation history, and Azure will reject messages containing
         tool calls it didn't initiate.
+        
+        Returns the message index for the filtered history.
         """
-        messages = context.messages
+        messages = index.messages
         if not messages:
-            return
+            return index
         
         original_count = len(messages)
-        filtered = []
         
-        # First pass: identify call_ids for frontend-only tools
-        frontend_tool_call_ids: set[str] = set()
-        
-        for msg in messages:
-            role = getattr(msg, 'role', None)
-            role_value = role.value if hasattr(role, 'value') else str(role) if role else 'unknown'
-            
-            if role_value.lower() == 'assistant':
-                msg_contents = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
-                if msg_contents:
-                    contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
-                    for c in contents:
-                        if isinstance(c, FunctionCallContent):
-                            tool_name = getattr(c, 'name', None)
-                            call_id = getattr(c, 'call_id', None)
-                            if tool_name in FRONTEND_ONLY_TOOLS and call_id:
-                                frontend_tool_call_ids.add(call_id)
-                                logger.debug("[DeduplicatingOrchestrator] Found frontend tool call: %s (id=%s)", tool_name, call_id[:12] if call_id else 'none')
+        # Call IDs for frontend-only tools were collected when the index was built
+        frontend_tool_call_ids = index.frontend_call_ids
         
         if not frontend_tool_call_ids:
             # No frontend tool calls found, nothing to filter
-            return
+            return index
         
         logger.debug("[DeduplicatingOrchestrator] Filtering %d frontend tool call IDs from %d messages", 
                     len(frontend_tool_call_ids), original_count)
         
-        # Second pass: filter/reconstruct messages
+        filtered = []
+        filtered_roles: list[str] = []
+        filtered_contents: list[list] = []
+        filtered_tool_related: list[bool] = []
+        
         for i, msg in enumerate(messages):
-            role = getattr(msg, 'role', None)
-            role_value = role.value if hasattr(role, 'value') else str(role) if role else 'unknown'
-            msg_contents = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
+            role_value = index.roles[i]
+            contents = index.contents[i]
             
             # Always keep user messages
-            if role_value.lower() == 'user':
-                filtered.append(msg)
-                continue
+            if role_value == 'user':
+                pass
             
             # Check tool result messages - filter if it's for a frontend tool
-            if role_value.lower() == 'tool':
-                if msg_contents:
-                    contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
-                    is_frontend_result = False
-                    for c in contents:
-                        call_id = getattr(c, 'call_id', None)
-                        if call_id and call_id in frontend_tool_call_ids:
-                            is_frontend_result = True
-                            break
-                    if is_frontend_result:
-                        logger.debug("[DeduplicatingOrchestrator] Filtering tool result for frontend tool (msg %d)", i)
-                        continue
-                filtered.append(msg)
-                continue
+            elif role_value == 'tool':
+                is_frontend_result = False
+                for c in contents:
+                    call_id = getattr(c, 'call_id', None)
+                    if call_id and call_id in frontend_tool_call_ids:
+                        is_frontend_result = True
+                        break
+                if is_frontend_result:
+                    logger.debug("[DeduplicatingOrchestrator] Filtering tool result for frontend tool (msg %d)", i)
+                    continue
             
             # Check assistant messages - reconstruct without frontend tool calls
-            if role_value.lower() == 'assistant':
-                if msg_contents:
-                    contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
-                    
-                    # Check if this message has any frontend tool calls
-                    has_frontend = False
-                    has_backend = False
-                    for c in contents:
-                        if isinstance(c, FunctionCallContent):
-                            call_id = getattr(c, 'call_id', None)
-                            if call_id and call_id in frontend_tool_call_ids:
-                                has_frontend = True
-                            else:
-                                has_backend = True
-                    
-                    if has_frontend:
-                        if not has_backend:
-                            # Only frontend tools - filter entire message
-                            logger.debug("[DeduplicatingOrchestrator] Filtering assistant msg with only frontend tools (msg %d)", i)
-                            continue
+            elif role_value == 'assistant' and contents:
+                # Check if this message has any frontend tool calls
+                has_frontend = False
+                has_backend = False
+                for c in contents:
+                    if isinstance(c, FunctionCallContent):
+                        call_id = getattr(c, 'call_id', None)
+                        if call_id and call_id in frontend_tool_call_ids:
+                            has_frontend = True
                         else:
-                            # Mixed tools - reconstruct without frontend tool calls
-                            new_contents = [c for c in contents 
-                                          if not (isinstance(c, FunctionCallContent) 
-                                                 and getattr(c, 'call_id', None) in frontend_tool_call_ids)]
-                            
-                            if new_contents:
-                                # Update the message contents in place
-                                if hasattr(msg, 'contents'):
-                                    msg.contents = new_contents
-                                elif hasattr(msg, 'content'):
-                                    msg.content = new_contents
-                                logger.debug("[DeduplicatingOrchestrator] Reconstructed assistant msg %d: removed %d frontend tools, kept %d items", 
-                                           i, len(contents) - len(new_contents), len(new_contents))
-                            else:
-                                # All contents were frontend tools
-                                logger.debug("[DeduplicatingOrchestrator] Filtering assistant msg - all contents were frontend tools (msg %d)", i)
-                                continue
+                            has_backend = True
                 
-                filtered.append(msg)
-                continue
+                if has_frontend:
+                    if not has_backend:
+                        # Only frontend tools - filter entire message
+                        logger.debug("[DeduplicatingOrchestrator] Filtering assistant msg with only frontend tools (msg %d)", i)
+                        continue
+                    else:
+                        # Mixed tools - reconstruct without frontend tool calls
+                        new_contents = [c for c in contents 
+                                      if not (isinstance(c, FunctionCallContent) 
+                                             and getattr(c, 'call_id', None) in frontend_tool_call_ids)]
+                        
+                        if new_contents:
+                            # Update the message contents in place
+                            if hasattr(msg, 'contents'):
+                                msg.contents = new_contents
+                            elif hasattr(msg, 'content'):
+                                msg.content = new_contents
+                            logger.debug("[DeduplicatingOrchestrator] Reconstructed assistant msg %d: removed %d frontend tools, kept %d items", 
+                                       i, len(contents) - len(new_contents), len(new_contents))
+                            contents = new_contents
+                        else:
+                            # All contents were frontend tools
+                            logger.debug("[DeduplicatingOrchestrator] Filtering assistant msg - all contents were frontend tools (msg %d)", i)
+                            continue
             
-            # Keep other message types (system, etc.)
+            # Keep everything else (user, system, non-frontend tool results, ...)
             filtered.append(msg)
+            filtered_roles.append(role_value)
+            filtered_contents.append(contents)
+            # Reconstructed messages keep their backend calls, so the flag still holds
+            filtered_tool_related.append(index.tool_related[i])
         
         if len(filtered) != original_count:
             context._messages = filtered
             logger.info("[DeduplicatingOrchestrator] Filtered frontend tool calls: %d -> %d messages", 
                        original_count, len(filtered))
+        else:
+            # Only in-place reconstructions - the message list itself is unchanged
+            filtered = messages
+        
+        return _MessageIndex(
+            messages=filtered,
+            roles=filtered_roles,
+            contents=filtered_contents,
+            tool_related=filtered_tool_related,
+            frontend_call_ids=frontend_tool_call_ids,
+            # Filtering only removes tool activity, so the flag stays a safe upper bound
+            has_tool_activity=index.has_tool_activity,
+        )
     
     def _filter_messages_for_fresh_start(
         self, 
         context: ExecutionContext, 
+        index: _MessageIndex,
         agui_thread_id: str | None,
         thread_response_store: dict[str, str]
     ) -> None:
@@ -237,62 +417,52 @@ class DeduplicatingOrchestrator(Orchestrator):
             # Continuing a conversation - the ResponsesApiThreadMiddleware handles this
             return
         
-        # Force load messages by accessing the property
-        messages = context.messages
+        messages = index.messages
         if not messages:
             return
         
+        # Pure-text histories (e.g. the first user turn) have nothing to remove
+        if not index.has_tool_activity:
+            return
+        
         original_count = len(messages)
         filtered = []
         
         logger.debug("[DeduplicatingOrchestrator] Filtering messages for fresh start: %d messages", original_count)
         
+        # Per-message trace lines are costly to build, so only do it when they'll be emitted
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
         for i, msg in enumerate(messages):
-            # Get role - could be enum or string
-            role = getattr(msg, 'role', None)
-            role_value = role.value if hasattr(role, 'value') else str(role) if role else 'unknown'
-            
-            # Check for contents (AG-UI SDK uses 'contents' plural)
-            msg_contents = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
+            role_value = index.roles[i]
+            contents = index.contents[i]
             
             # Log what we're seeing
-            contents_info = []
-            if msg_contents:
-                for c in (msg_contents if isinstance(msg_contents, list) else [msg_contents]):
+            if debug_enabled:
+                contents_info = []
+                for c in contents:
                     c_type = type(c).__name__
                     call_id = getattr(c, 'call_id', None)
                     if call_id:
                         contents_info.append(f"{c_type}(call_id={call_id[:12]}...)")
                     else:
                         contents_info.append(c_type)
-            logger.debug("[DeduplicatingOrchestrator]   msg[%d]: role=%s, contents=%s", i, role_value, contents_info)
+                logger.debug("[DeduplicatingOrchestrator]   msg[%d]: role=%s, contents=%s", i, role_value, contents_info)
             
             # Always keep user messages
-            if role_value.lower() == 'user':
+            if role_value == 'user':
                 logger.debug("[DeduplicatingOrchestrator]     -> KEEP (user)")
                 filtered.append(msg)
                 continue
             
             # Skip tool messages entirely
-            if role_value.lower() == 'tool':
+            if role_value == 'tool':
                 logger.debug("[DeduplicatingOrchestrator]     -> REMOVE (tool role)")
                 continue
             
             # For assistant messages, check if they contain tool calls or results
-            if role_value.lower() == 'assistant':
-                has_tool_related = False
-                if msg_contents:
-                    contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
-                    for c in contents:
-                        if isinstance(c, (FunctionCallContent, FunctionResultContent)):
-                            has_tool_related = True
-                            break
-                        # Also check for any content with call_id attribute
-                        if hasattr(c, 'call_id') and c.call_id:
-                            has_tool_related = True
-                            break
-                
-                if has_tool_related:
+            if role_value == 'assistant':
+                if index.tool_related[i]:
                     logger.debug("[DeduplicatingOrchestrator]     -> REMOVE (assistant with tool call/result)")
                     continue
                 
@@ -310,7 +480,7 @@ class DeduplicatingOrchestrator(Orchestrator):
             context._messages = filtered
             logger.debug("[DeduplicatingOrchestrator] Filtered messages: %d -> %d", original_count, len(filtered))
     
-    def _is_frontend_tool_result_only(self, context: ExecutionContext) -> bool:
+    def _is_frontend_tool_result_only(self, index: _MessageIndex) -> bool:
         """Check if this request is just a tool result for a frontend-only tool.
         
         When CopilotKit handles a frontend action (like filter_dashboard), it sends
@@ -320,45 +490,20 @@ class DeduplicatingOrchestrator(Orchestrator):
         We detect this by checking if the last message is a TOOL message (FunctionResultContent)
         for a frontend-only tool.
         """
-        messages = context.messages
-        if not messages:
+        if not index.messages:
             return False
         
-        # Get the last message
-        last_msg = messages[-1]
-        role = getattr(last_msg, 'role', None)
-        role_value = role.value if hasattr(role, 'value') else str(role) if role else 'unknown'
-        
         # If last message is not a tool result, not a frontend tool result
-        if role_value.lower() != 'tool':
-            return False
-        
-        # Check if it's a result for a frontend-only tool
-        msg_contents = getattr(last_msg, 'contents', None) or getattr(last_msg, 'content', None)
-        if not msg_contents:
+        if index.roles[-1] != 'tool':
             return False
         
-        contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
-        for c in contents:
+        # Check if it's a result for a frontend-only tool (call IDs were collected with the index)
+        for c in index.contents[-1]:
             if isinstance(c, FunctionResultContent):
-                # Check the call_id - we need to find the corresponding tool call
                 call_id = getattr(c, 'call_id', None)
-                if call_id:
-                    # Look for the assistant message with this call_id
-                    for msg in messages:
-                        msg_role = getattr(msg, 'role', None)
-                        msg_role_value = msg_role.value if hasattr(msg_role, 'value') else str(msg_role) if msg_role else 'unknown'
-                        if msg_role_value.lower() == 'assistant':
-                            msg_contents2 = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
-                            if msg_contents2:
-                                contents2 = msg_contents2 if isinstance(msg_contents2, list) else [msg_contents2]
-                                for c2 in contents2:
-                                    if isinstance(c2, FunctionCallContent):
-                                        if getattr(c2, 'call_id', None) == call_id:
-                                            tool_name = getattr(c2, 'name', None)
-                                            if tool_name in FRONTEND_ONLY_TOOLS:
-                                                logger.debug("[DeduplicatingOrchestrator] Last message is result for frontend tool: %s", tool_name)
-                                                return True
+                if call_id and call_id in index.frontend_call_ids:
+                    logger.debug("[DeduplicatingOrchestrator] Last message is result for frontend tool (call_id=%s)", call_id[:12])
+                    return True
         
         return False
     
@@ -382,11 +527,17 @@ class DeduplicatingOrchestrator(Orchestrator):
         # Set the thread_id ContextVar so the middleware can access it
         token = current_agui_thread_id.set(agui_thread_id)
         
+        # Recent inner event types, logged as one DEBUG line when the run ends (see finally)
+        event_trace: deque[str] | None = None
+        
         try:
             # IMPORTANT: Check if this is just a frontend tool result (e.g., filter_dashboard).
             # If so, we should NOT invoke the LLM again - CopilotKit already handled the action
             # and the conversation turn is complete. Just emit completion events and return.
-            if self._is_frontend_tool_result_only(context):
+            # Normalize roles/contents once; the filters and checks below all read this view
+            message_index = _build_message_index(context.messages)
+            
+            if self._is_frontend_tool_result_only(message_index):
                 logger.info("[DeduplicatingOrchestrator] Frontend tool result detected - completing run without LLM invocation")
                 
                 # CRITICAL: Clear the stored response_id for this thread.
@@ -412,7 +563,7 @@ class DeduplicatingOrchestrator(Orchestrator):
             # ALWAYS filter out frontend-only tool calls from the message history.
             # These tools (like filter_dashboard) are handled by CopilotKit locally
             # and Azure will reject messages containing tool calls it didn't initiate.
-            self._filter_frontend_tool_calls(context)
+            message_index = self._filter_frontend_tool_calls(context, message_index)
             
             # Check if we're continuing a conversation (have stored response_id)
             is_continuation = agui_thread_id and agui_thread_id in thread_response_store
@@ -421,18 +572,17 @@ class DeduplicatingOrchestrator(Orchestrator):
             # This prevents KeyError on call_id_to_id when the SDK tries to process messages
             # that contain tool calls it doesn't have mappings for
             if not is_continuation:
-                self._filter_messages_for_fresh_start(context, agui_thread_id, thread_response_store)
+                self._filter_messages_for_fresh_start(context, message_index, agui_thread_id, thread_response_store)
             
             if is_continuation:
                 logger.debug("[DeduplicatingOrchestrator] CONTINUING conversation - will send tool result to Azure")
             else:
                 logger.debug("[DeduplicatingOrchestrator] NEW conversation")
             
-            seen_tool_call_ids: set[str] = set()
-            completed_tool_call_ids: set[str] = set()
-            
-            # Track tool call names for each ID (so we know which tools completed)
+            # Track tool call names for each ID (so we know which tools completed) - the keys
+            # double as the set of started calls, so args/end/result events need one lookup
             tool_call_names: dict[str, str] = {}
+            completed_tool_call_ids: set[str] = set()
             
             # Extracted state from tool results - will be emitted as StateSnapshotEvent
             extracted_state: dict = {}
@@ -445,28 +595,28 @@ class DeduplicatingOrchestrator(Orchestrator):
             # This preserves frontend-only fields like activeFilter and selectedRoute
             # that should not be overwritten by the agent's state
             frontend_state: dict = {}
+            current_active_filter, current_selected_flight = _agent_context_vars()
             incoming_state = sanitize_state(context.input_data.get("state", {}))
             logger.info("[DeduplicatingOrchestrator] Incoming state keys: %s", list(incoming_state.keys()) if incoming_state else "None")
             if incoming_state:
                 active_filter_in_state = incoming_state.get("activeFilter")
                 logger.info("[DeduplicatingOrchestrator] activeFilter in incoming state: %s", active_filter_in_state)
                 
-                for field in FRONTEND_ONLY_STATE_FIELDS:
-                    if field in incoming_state and incoming_state[field] is not None:
-                        frontend_state[field] = incoming_state[field]
-                        logger.debug("[DeduplicatingOrchestrator] Preserving frontend field '%s': %s", field, incoming_state[field])
+                frontend_state = {
+                    field: value
+                    for field in FRONTEND_ONLY_STATE_FIELDS & incoming_state.keys()
+                    if (value := incoming_state[field]) is not None
+                }
+                if frontend_state:
+                    logger.debug("[DeduplicatingOrchestrator] Preserving frontend fields: %s", frontend_state)
                 
                 # Set the current active filter ContextVar for tools to access
                 # This allows analyze_flights to automatically use the current filter
                 active_filter = incoming_state.get("activeFilter")
-                from agents.logistics_agent import current_active_filter
                 
                 if active_filter:
                     # Clean up __KEEP__ sentinel values - they should be treated as None
-                    cleaned_filter = {
-                        k: (None if v == "__KEEP__" else v)
-                        for k, v in active_filter.items()
-                    }
+                    cleaned_filter = _strip_keep_sentinels(active_filter)
                     
                     # Check if there are any MEANINGFUL filter values (not just nulls)
                     # A filter with all null values should be treated as "no filter"
@@ -496,62 +646,92 @@ class DeduplicatingOrchestrator(Orchestrator):
                 # This allows analyze_flights to automatically analyze the selected flight
                 selected_flight = incoming_state.get("selectedFlight")
                 if selected_flight:
-                    from agents.logistics_agent import current_selected_flight
                     current_selected_flight.set(selected_flight)
                     logger.info("[DeduplicatingOrchestrator] Set current_selected_flight ContextVar: %s", selected_flight.get('flightNumber'))
                 else:
                     # Clear selected flight if not present
-                    from agents.logistics_agent import current_selected_flight
                     current_selected_flight.set(None)
                     logger.debug("[DeduplicatingOrchestrator] No selectedFlight in incoming state")
             
             # Track text message lifecycle to ensure proper START/END pairing
             # Buffer START events until we see content - this filters out "tool-only response" placeholders
-            pending_start_events: dict[str, TextMessageStartEvent] = {}  # message_id -> event
-            active_text_message_ids: set[str] = set()  # Messages that have been emitted (had content)
+            # message_id -> buffered START event while pending, None once emitted (had content)
+            text_messages: dict[str, TextMessageStartEvent | None] = {}
+            
+            # Mid-run snapshots identical to the last one sent are skipped (e.g. a repeated
+            # fetch_flights with the same filter); the RunFinished snapshot is always sent
+            last_emitted_snapshot: dict | None = None
+            
+            # Checked once per run - several trace lines below do real work to build their arguments
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+            if debug_enabled:
+                event_trace = deque(maxlen=_EVENT_TRACE_SIZE)
             
             async for event in self._inner.run(context):
-                # Log all events for debugging
-                event_type = type(event).__name__
-                logger.debug("[DeduplicatingOrchestrator] Event: %s", event_type)
+                # Dispatch on the exact event type: identity checks, with streamed text
+                # deltas (by far the most frequent event) tested first
+                event_type = type(event)
+                
+                # Record all events for debugging - one log line per run instead of per event
+                if debug_enabled:
+                    event_trace.append(event_type.__name__)
+                
+                # --- Text message content (see lifecycle tracking below) ---
+                if event_type is TextMessageContentEvent:
+                    message_id = event.message_id
+                    # Only emit content for messages we've started
+                    try:
+                        start_event = text_messages[message_id]
+                    except KeyError:
+                        logger.warning("[DeduplicatingOrchestrator] TextMessageContent for unknown message: %s, skipping", message_id)
+                        continue
+                    # If we have a pending start for this message, emit it now
+                    if start_event is not None:
+                        text_messages[message_id] = None
+                        logger.debug("[DeduplicatingOrchestrator] Emitting buffered TextMessageStart: %s", message_id)
+                        yield start_event
                 
                 # --- StateSnapshotEvent - BUFFER instead of emitting immediately ---
                 # This prevents flashing when inner orchestrator emits state BEFORE
                 # we've extracted activeFilter from tool results
-                if isinstance(event, StateSnapshotEvent):
+                elif event_type is StateSnapshotEvent:
                     snapshot = event.snapshot or {}
-                    flights_count = len(snapshot.get('flights', []))
-                    historical_count = len(snapshot.get('historicalData', []))
-                    logger.debug("[DeduplicatingOrchestrator] StateSnapshotEvent from inner (buffering): keys=%s, flights=%d, historical=%d",
-                               list(snapshot.keys()), flights_count, historical_count)
+                    if debug_enabled:
+                        logger.debug("[DeduplicatingOrchestrator] StateSnapshotEvent from inner (buffering): keys=%s, flights=%d, historical=%d",
+                                   list(snapshot.keys()), len(snapshot.get('flights') or ()), len(snapshot.get('historicalData') or ()))
                     
                     # ALWAYS preserve the inner state - it may have fields we don't extract
                     # Only update fields that have actual data (don't overwrite with empty)
+                    # "Empty" means None, [] or {} - 0, False and "" still count as data
                     for key, value in snapshot.items():
-                        if value is not None and value != [] and value != {}:
-                            last_inner_state[key] = value
-                        elif key not in last_inner_state:
-                            # Set to empty if we haven't seen this key before
+                        if (value is not None and not (isinstance(value, (list, dict)) and not value)) or key not in last_inner_state:
+                            # Real data always wins; empties only seed keys we haven't seen yet
                             last_inner_state[key] = value
                     
                     # DON'T emit here - buffer and emit once at RunFinished
                     # This ensures we have all extracted state (activeFilter) before emitting
                     continue
                 
+                # --- StateDeltaEvent (predictive state) - passed through as-is ---
+                # It changes the client's state behind our back, so the next snapshot can't be
+                # skipped as "identical to the last one sent"
+                elif event_type is StateDeltaEvent:
+                    last_emitted_snapshot = None
+                
                 # --- Tool call deduplication ---
-                elif isinstance(event, ToolCallStartEvent):
+                elif event_type is ToolCallStartEvent:
                     tool_call_id = event.tool_call_id
                     tool_name = event.tool_call_name
                     
-                    logger.debug("[DeduplicatingOrchestrator] ToolCallStart: name=%s, id=%s", tool_name, tool_call_id[:12] if tool_call_id else "None")
+                    if debug_enabled:
+                        logger.debug("[DeduplicatingOrchestrator] ToolCallStart: name=%s, id=%s", tool_name, tool_call_id[:12] if tool_call_id else "None")
                     
                     # Check for duplicate first (applies to ALL tools, frontend and backend)
-                    if tool_call_id in seen_tool_call_ids:
+                    if tool_call_id in tool_call_names:
                         logger.debug("[DeduplicatingOrchestrator] Filtering duplicate ToolCallStartEvent: %s (%s)", tool_call_id, tool_name)
                         continue
                     
                     # Track this tool call
-                    seen_tool_call_ids.add(tool_call_id)
                     tool_call_names[tool_call_id] = tool_name
                     
                     # Log ALL tool calls at INFO level to see what's happening
@@ -560,10 +740,12 @@ class DeduplicatingOrchestrator(Orchestrator):
                     else:
                         logger.debug("[DeduplicatingOrchestrator] -> BACKEND tool: %s", tool_name)
                 
-                elif isinstance(event, ToolCallArgsEvent):
+                elif event_type is ToolCallArgsEvent:
                     tool_call_id = event.tool_call_id
                     # Only emit args for tool calls we've started
-                    if tool_call_id not in seen_tool_call_ids:
+                    try:
+                        tool_name = tool_call_names[tool_call_id]
+                    except KeyError:
                         logger.debug("[DeduplicatingOrchestrator] Filtering ToolCallArgsEvent for unknown call: %s", tool_call_id)
                         continue
                     # Don't emit args for completed tool calls
@@ -573,20 +755,17 @@ class DeduplicatingOrchestrator(Orchestrator):
                     
                     # Extract state from frontend tool calls
                     # When filter_dashboard is called, capture the filter args so we can preserve them
-                    tool_name = tool_call_names.get(tool_call_id)
                     if tool_name == "filter_dashboard" and event.delta:
-                        # Accumulate args for this tool call
-                        if not hasattr(self, '_tool_args_buffer'):
-                            self._tool_args_buffer = {}
-                        if tool_call_id not in self._tool_args_buffer:
-                            self._tool_args_buffer[tool_call_id] = ""
-                        self._tool_args_buffer[tool_call_id] += event.delta
+                        # Accumulate args for this tool call (joined once at ToolCallEnd)
+                        self._tool_args_buffer.setdefault(tool_call_id, []).append(event.delta)
                     # Note: Don't continue here - we still need to yield the event
                 
-                elif isinstance(event, ToolCallEndEvent):
+                elif event_type is ToolCallEndEvent:
                     tool_call_id = event.tool_call_id
                     # Skip if we haven't seen this tool call start
-                    if tool_call_id not in seen_tool_call_ids:
+                    try:
+                        tool_name = tool_call_names[tool_call_id]
+                    except KeyError:
                         logger.debug("[DeduplicatingOrchestrator] Filtering ToolCallEndEvent for unknown call: %s", tool_call_id)
                         continue
                     if tool_call_id in completed_tool_call_ids:
@@ -596,18 +775,19 @@ class DeduplicatingOrchestrator(Orchestrator):
                     logger.debug("[DeduplicatingOrchestrator] Emitting ToolCallEndEvent: %s", tool_call_id)
                     
                     # Extract filter state from filter_dashboard tool call when it ends
-                    tool_name = tool_call_names.get(tool_call_id)
-                    if tool_name == "filter_dashboard" and hasattr(self, '_tool_args_buffer'):
-                        args_str = self._tool_args_buffer.get(tool_call_id, "")
-                        if args_str:
+                    if tool_name == "filter_dashboard":
+                        args_str = "".join(self._tool_args_buffer.pop(tool_call_id, ()))
+                        if args_str and not _looks_like_json_object(args_str):
+                            logger.warning("[DeduplicatingOrchestrator] Ignoring non-object filter_dashboard args: %.200s", args_str)
+                        elif args_str:
                             try:
-                                args = json.loads(args_str)
+                                args = _json_loads(args_str)
                                 logger.debug("[DeduplicatingOrchestrator] Extracted filter_dashboard args: %s", args)
                                 
                                 # Normalize route format like the frontend does
                                 route = args.get("route")
                                 if route:
-                                    route = route.upper().replace("-", " → ").replace(" TO ", " → ")
+                                    route = _normalize_route(route)
                                 
                                 utilization_type = args.get("utilizationType")
                                 
@@ -631,31 +811,37 @@ class DeduplicatingOrchestrator(Orchestrator):
                                 # Emit a StateSnapshotEvent with the updated filter
                                 # This ensures the frontend gets the filter before the run finishes
                                 merged = {**last_inner_state, **extracted_state, **frontend_state}
-                                logger.debug("[DeduplicatingOrchestrator] Emitting StateSnapshotEvent after filter_dashboard: activeFilter=%s", merged.get('activeFilter'))
-                                yield StateSnapshotEvent(snapshot=merged)
+                                if merged != last_emitted_snapshot:
+                                    if debug_enabled:
+                                        logger.debug("[DeduplicatingOrchestrator] Emitting StateSnapshotEvent after filter_dashboard: activeFilter=%s", merged.get('activeFilter'))
+                                    yield StateSnapshotEvent(snapshot=merged)
+                                    last_emitted_snapshot = merged
                                 continue  # Skip the default yield since we already yielded the event
                                 
                             except (json.JSONDecodeError, TypeError) as e:
                                 logger.warning("[DeduplicatingOrchestrator] Failed to parse filter_dashboard args: %s", e)
                 
-                elif isinstance(event, ToolCallResultEvent):
+                elif event_type is ToolCallResultEvent:
                     tool_call_id = event.tool_call_id
                     # Results should only come after the call ends, but filter duplicates anyway
-                    if tool_call_id not in seen_tool_call_ids:
+                    try:
+                        tool_name = tool_call_names[tool_call_id]
+                    except KeyError:
                         logger.debug("[DeduplicatingOrchestrator] Filtering ToolCallResultEvent for unknown call: %s", tool_call_id)
                         continue
                     
                     # Extract state from tool results
-                    tool_name = tool_call_names.get(tool_call_id, "unknown")
                     result = event.content
                     
-                    logger.debug("[DeduplicatingOrchestrator] ToolCallResultEvent: tool=%s, content_type=%s, content_preview=%s",
-                               tool_name, type(result).__name__, str(result)[:200])
+                    if debug_enabled:
+                        logger.debug("[DeduplicatingOrchestrator] ToolCallResultEvent: tool=%s, content_type=%s, content_preview=%s",
+                                   tool_name, type(result).__name__, str(result)[:200])
                     
-                    # Try to parse JSON if it's a string
-                    if isinstance(result, str):
+                    # Try to parse JSON if it's a string - only objects carry state, so plain-text
+                    # results ("Error: ...") and arrays are skipped without a failed parse
+                    if isinstance(result, str) and _looks_like_json_object(result):
                         try:
-                            result = json.loads(result)
+                            result = _json_loads(result)
                         except (json.JSONDecodeError, TypeError):
                             pass
                     
@@ -663,30 +849,27 @@ class DeduplicatingOrchestrator(Orchestrator):
                     if isinstance(result, dict):
                         if "flights" in result:
                             extracted_state["flights"] = result["flights"]
-                            logger.debug("[DeduplicatingOrchestrator] Extracted %d flights from %s",
-                                       len(result["flights"]), tool_name)
+                            if debug_enabled:
+                                logger.debug("[DeduplicatingOrchestrator] Extracted %d flights from %s",
+                                           len(result["flights"] or ()), tool_name)
                         if "historical_data" in result:
                             extracted_state["historicalData"] = result["historical_data"]
-                            logger.debug("[DeduplicatingOrchestrator] Extracted %d historical points from %s",
-                                       len(result["historical_data"]), tool_name)
+                            if debug_enabled:
+                                logger.debug("[DeduplicatingOrchestrator] Extracted %d historical points from %s",
+                                           len(result["historical_data"] or ()), tool_name)
                         if "selectedFlight" in result:
                             extracted_state["selectedFlight"] = result["selectedFlight"]
                             logger.debug("[DeduplicatingOrchestrator] Extracted selectedFlight from %s", tool_name)
                         # Extract activeFilter from fetch_flights/clear_filter tool results
                         if "activeFilter" in result:
                             # Clean up __KEEP__ sentinel values - they should be treated as None
-                            raw_filter = result["activeFilter"]
-                            cleaned_filter = {
-                                k: (None if v == "__KEEP__" else v)
-                                for k, v in raw_filter.items()
-                            }
+                            cleaned_filter = _strip_keep_sentinels(result["activeFilter"])
                             extracted_state["activeFilter"] = cleaned_filter
                             logger.info("[DeduplicatingOrchestrator] Extracted activeFilter from %s: %s", 
                                        tool_name, cleaned_filter)
                             
                             # Also update the ContextVar so subsequent tools (like analyze_flights)
                             # can access the updated filter within the same request
-                            from agents.logistics_agent import current_active_filter
                             current_active_filter.set(cleaned_filter)
                             logger.debug("[DeduplicatingOrchestrator] Updated current_active_filter ContextVar: %s", cleaned_filter)
                             
@@ -696,73 +879,66 @@ class DeduplicatingOrchestrator(Orchestrator):
                             yield event  # ToolCallResultEvent - marks tool complete
                             
                             merged = {**last_inner_state, **extracted_state, **frontend_state}
-                            logger.info("[DeduplicatingOrchestrator] Emitting EARLY StateSnapshotEvent for activeFilter: %s", cleaned_filter)
-                            yield StateSnapshotEvent(snapshot=merged)
+                            if merged != last_emitted_snapshot:
+                                logger.info("[DeduplicatingOrchestrator] Emitting EARLY StateSnapshotEvent for activeFilter: %s", cleaned_filter)
+                                yield StateSnapshotEvent(snapshot=merged)
+                                last_emitted_snapshot = merged
                             continue  # Skip the default yield since we already yielded the event
                 
                 # --- Text message lifecycle tracking (with buffering) ---
-                elif isinstance(event, TextMessageStartEvent):
+                elif event_type is TextMessageStartEvent:
                     message_id = event.message_id
-                    if message_id in pending_start_events or message_id in active_text_message_ids:
+                    if message_id in text_messages:
                         logger.debug("[DeduplicatingOrchestrator] Filtering duplicate TextMessageStartEvent: %s", message_id)
                         continue
                     # Buffer the START event - only emit when we see content
-                    pending_start_events[message_id] = event
+                    text_messages[message_id] = event
                     logger.debug("[DeduplicatingOrchestrator] Buffering TextMessageStart: %s", message_id)
                     continue  # Don't yield yet
                 
-                elif isinstance(event, TextMessageContentEvent):
+                elif event_type is TextMessageEndEvent:
                     message_id = event.message_id
-                    # If we have a pending start for this message, emit it now
-                    if message_id in pending_start_events:
-                        start_event = pending_start_events.pop(message_id)
-                        active_text_message_ids.add(message_id)
-                        logger.debug("[DeduplicatingOrchestrator] Emitting buffered TextMessageStart: %s", message_id)
-                        yield start_event
-                    # Only emit content for messages we've started
-                    if message_id not in active_text_message_ids:
-                        logger.warning("[DeduplicatingOrchestrator] TextMessageContent for unknown message: %s, skipping", message_id)
+                    try:
+                        start_event = text_messages.pop(message_id)
+                    except KeyError:
+                        logger.warning("[DeduplicatingOrchestrator] TextMessageEnd for unknown message: %s, skipping", message_id)
                         continue
-                
-                elif isinstance(event, TextMessageEndEvent):
-                    message_id = event.message_id
                     # If message is still pending (never got content), just drop both start and end
-                    if message_id in pending_start_events:
-                        pending_start_events.pop(message_id)
+                    if start_event is not None:
                         logger.debug("[DeduplicatingOrchestrator] Dropping phantom message (no content): %s", message_id)
                         continue
-                    if message_id not in active_text_message_ids:
-                        logger.warning("[DeduplicatingOrchestrator] TextMessageEnd for unknown message: %s, skipping", message_id)
-                        continue
-                    active_text_message_ids.discard(message_id)
                     logger.debug("[DeduplicatingOrchestrator] Closing TextMessage: %s", message_id)
                 
-                elif isinstance(event, RunFinishedEvent):
-                    # Close any messages that are active (received content but not closed)
-                    if active_text_message_ids:
-                        logger.warning("[DeduplicatingOrchestrator] Found %d unclosed text messages, closing them", 
-                                      len(active_text_message_ids))
-                        for msg_id in list(active_text_message_ids):
-                            logger.debug("[DeduplicatingOrchestrator] Emitting TextMessageEndEvent for: %s", msg_id)
-                            yield TextMessageEndEvent(message_id=msg_id)
-                        active_text_message_ids.clear()
-                    
-                    # Drop any pending (phantom) messages that never got content
-                    if pending_start_events:
-                        logger.debug("[DeduplicatingOrchestrator] Dropping %d phantom text messages", len(pending_start_events))
-                        pending_start_events.clear()
+                elif event_type is RunFinishedEvent:
+                    if text_messages:
+                        # Close any messages that are active (received content but not closed)
+                        active_message_ids = [msg_id for msg_id, start_event in text_messages.items() if start_event is None]
+                        if active_message_ids:
+                            logger.warning("[DeduplicatingOrchestrator] Found %d unclosed text messages, closing them", 
+                                          len(active_message_ids))
+                            for msg_id in active_message_ids:
+                                logger.debug("[DeduplicatingOrchestrator] Emitting TextMessageEndEvent for: %s", msg_id)
+                                yield TextMessageEndEvent(message_id=msg_id)
+                        
+                        # Drop any pending (phantom) messages that never got content
+                        if len(text_messages) > len(active_message_ids):
+                            logger.debug("[DeduplicatingOrchestrator] Dropping %d phantom text messages", len(text_messages) - len(active_message_ids))
+                        text_messages.clear()
                     
                     # Emit final StateSnapshotEvent with all buffered state merged
                     # Merge order: inner state < extracted state < frontend state
                     merged = {**last_inner_state, **extracted_state, **frontend_state}
                     logger.info("[DeduplicatingOrchestrator] RunFinished - emitting final state: flights=%d, historical=%d, activeFilter=%s",
-                               len(merged.get('flights', [])),
-                               len(merged.get('historicalData', [])),
+                               len(merged.get('flights') or ()),
+                               len(merged.get('historicalData') or ()),
                                merged.get('activeFilter'))
                     yield StateSnapshotEvent(snapshot=merged)
+                    last_emitted_snapshot = merged
                 
                 yield event
         finally:
+            if event_trace:
+                logger.debug("[DeduplicatingOrchestrator] Inner events (last %d): %s", len(event_trace), ", ".join(event_trace))
             # Only reset the thread_id ContextVar here
             # DON'T reset ended_with_frontend_tool - the middleware needs to read it
             # after the generator completes. It will be reset at the start of the next request.
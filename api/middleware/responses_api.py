@@ -7,6 +7,7 @@ It maps AG-UI client thread IDs to Azure response_id chains.
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from contextvars import ContextVar
 from typing import Callable, Awaitable
 from collections.abc import AsyncIterable
@@ -19,9 +20,27 @@ from agent_framework._middleware import ChatMiddleware, ChatContext
 logger = logging.getLogger(__name__)
 
 
+# Upper bound on the number of AG-UI threads we remember a response_id for
+_MAX_TRACKED_THREADS = 10_000
+
+
+class _ThreadResponseStore(OrderedDict):
+    """thread_id -> response_id map that forgets the least recently stored thread when full.
+    
+    Every completed run re-stores its thread's response_id, so ordering by last write
+    keeps active conversations and lets abandoned client threads age out.
+    """
+    
+    def __setitem__(self, key: str, value: str) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > _MAX_TRACKED_THREADS:
+            self.popitem(last=False)
+
+
 # Thread mapping store: maps AG-UI thread_id (client UUID) to Azure response_id
 # This persists the response ID across requests so we can reuse Azure server-side state
-_thread_response_store: dict[str, str] = {}
+_thread_response_store: dict[str, str] = _ThreadResponseStore()
 
 # ContextVar to pass AG-UI thread_id from orchestrator to middleware
 # This allows the middleware to access the thread_id without modifying kwargs
@@ -36,13 +55,13 @@ _ended_with_frontend_tool: ContextVar[bool] = ContextVar("ended_with_frontend_to
 # Frontend-only tools that are handled by CopilotKit, not the backend
 # These tools don't send results back to Azure, so we shouldn't continue
 # a conversation that ended with one of these tool calls
-FRONTEND_ONLY_TOOLS = {
+FRONTEND_ONLY_TOOLS = frozenset({
     "filter_dashboard",
     "setThemeColor",
     "display_flight_list",
     "display_flight_detail",
     "display_historical_chart",
-}
+})
 
 
 def get_thread_response_store() -> dict[str, str]:
@@ -80,21 +99,23 @@ class ResponsesApiThreadMiddleware(ChatMiddleware):
         # Get the AG-UI thread_id from ContextVar (set by DeduplicatingOrchestrator)
         agui_thread_id = _current_agui_thread_id.get()
         
-        # Log incoming messages for debugging
-        logger.debug("[ResponsesApiThreadMiddleware] Incoming messages: %d", len(context.messages) if context.messages else 0)
-        for i, msg in enumerate(context.messages or []):
-            role = getattr(msg, 'role', 'unknown')
-            contents_info = []
-            if hasattr(msg, 'content') and msg.content:
-                for c in (msg.content if isinstance(msg.content, list) else [msg.content]):
-                    c_type = type(c).__name__
-                    if hasattr(c, 'call_id'):
-                        contents_info.append(f"{c_type}(call_id={c.call_id[:12] if c.call_id else None})")
-                    elif hasattr(c, 'name'):
-                        contents_info.append(f"{c_type}(name={c.name})")
-                    else:
-                        contents_info.append(c_type)
-            logger.debug("[ResponsesApiThreadMiddleware]   msg[%d]: role=%s, contents=%s", i, role, contents_info)
+        # Log incoming messages for debugging - the per-message summaries (slicing call ids,
+        # formatting type names) are only built when debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[ResponsesApiThreadMiddleware] Incoming messages: %d", len(context.messages) if context.messages else 0)
+            for i, msg in enumerate(context.messages or []):
+                role = getattr(msg, 'role', 'unknown')
+                contents_info = []
+                if hasattr(msg, 'content') and msg.content:
+                    for c in (msg.content if isinstance(msg.content, list) else [msg.content]):
+                        c_type = type(c).__name__
+                        if hasattr(c, 'call_id'):
+                            contents_info.append(f"{c_type}(call_id={c.call_id[:12] if c.call_id else None})")
+                        elif hasattr(c, 'name'):
+                            contents_info.append(f"{c_type}(name={c.name})")
+                        else:
+                            contents_info.append(c_type)
+                logger.debug("[ResponsesApiThreadMiddleware]   msg[%d]: role=%s, contents=%s", i, role, contents_info)
         
         # Check if we have a stored response_id for this AG-UI thread
         if agui_thread_id and agui_thread_id in _thread_response_store:
@@ -153,12 +174,14 @@ class ResponsesApiThreadMiddleware(ChatMiddleware):
         """
         last_response_id: str | None = None
         last_tool_name: str | None = None
+        # Checked once per stream rather than on every streamed update
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         
         async for update in stream:
-            if update.response_id:
-                last_response_id = update.response_id
-            if update.conversation_id:
-                last_response_id = update.conversation_id
+            # conversation_id takes precedence over response_id when an update carries both
+            response_id = update.conversation_id or update.response_id
+            if response_id:
+                last_response_id = response_id
             
             # Track tool calls to detect frontend-only tools
             if update.contents:
@@ -168,7 +191,8 @@ class ResponsesApiThreadMiddleware(ChatMiddleware):
                         tool_name = content.name
                         if tool_name:
                             last_tool_name = tool_name
-                            logger.debug("[ResponsesApiThreadMiddleware] Saw tool call: %s", tool_name)
+                            if debug_enabled:
+                                logger.debug("[ResponsesApiThreadMiddleware] Saw tool call: %s", tool_name)
             
             yield update
         
@@ -275,21 +299,30 @@ class ResponsesApiThreadMiddleware(ChatMiddleware):
         
         logger.debug("[ResponsesApiThreadMiddleware] _filter_messages_for_fresh_start: examining %d messages", original_count)
         
+        # Per-message trace lines are costly to build, so only do it when they'll be emitted
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
         for i, msg in enumerate(messages):
             role = getattr(msg, 'role', None)
             
-            # Log message details - check both 'content' and 'contents' (different SDK versions use different names)
-            contents_info = []
+            # Check both 'content' and 'contents' (different SDK versions use different names)
             msg_contents = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
-            if msg_contents:
-                for c in (msg_contents if isinstance(msg_contents, list) else [msg_contents]):
+            if not msg_contents:
+                contents = []
+            else:
+                contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
+            
+            # Log message details
+            if debug_enabled:
+                contents_info = []
+                for c in contents:
                     c_type = type(c).__name__
                     call_id = getattr(c, 'call_id', None)
                     if call_id:
                         contents_info.append(f"{c_type}(call_id={call_id[:12]}...)")
                     else:
                         contents_info.append(c_type)
-            logger.debug("[ResponsesApiThreadMiddleware]   msg[%d]: role=%s, contents=%s", i, role, contents_info)
+                logger.debug("[ResponsesApiThreadMiddleware]   msg[%d]: role=%s, contents=%s", i, role, contents_info)
             
             # Always keep user messages
             if role == Role.USER:
@@ -305,17 +338,14 @@ class ResponsesApiThreadMiddleware(ChatMiddleware):
             # For assistant messages, check if they contain tool calls or tool results
             if role == Role.ASSISTANT:
                 has_tool_related = False
-                msg_contents = getattr(msg, 'contents', None) or getattr(msg, 'content', None)
-                if msg_contents:
-                    contents = msg_contents if isinstance(msg_contents, list) else [msg_contents]
-                    for c in contents:
-                        if isinstance(c, (FunctionCallContent, FunctionResultContent)):
-                            has_tool_related = True
-                            break
-                        # Also check for any content with call_id attribute
-                        if hasattr(c, 'call_id') and c.call_id:
-                            has_tool_related = True
-                            break
+                for c in contents:
+                    if isinstance(c, (FunctionCallContent, FunctionResultContent)):
+                        has_tool_related = True
+                        break
+                    # Also check for any content with call_id attribute
+                    if hasattr(c, 'call_id') and c.call_id:
+                        has_tool_related = True
+                        break
                 
                 if has_tool_related:
                     logger.debug("[ResponsesApiThreadMiddleware]     -> REMOVE (assistant with tool call/result)")
@@ -334,76 +364,3 @@ class ResponsesApiThreadMiddleware(ChatMiddleware):
             context.messages.clear()
             context.messages.extend(filtered)
             logger.debug("[ResponsesApiThreadMiddleware] Fresh start filter: %d -> %d messages", original_count, len(filtered))
-
-
-async def deduplicate_tool_calls(
-    stream: AsyncIterable[ChatResponseUpdate],
-    agui_thread_id: str | None,
-) -> AsyncIterable[ChatResponseUpdate]:
-    """Wrap a streaming response to deduplicate tool call events.
-    
-    The v2 Responses API can emit the same tool call multiple times in a response,
-    which causes AG-UI to throw "TOOL_CALL_START already in progress" errors.
-    
-    This wrapper tracks seen tool call IDs and filters out duplicates while
-    preserving all other update properties (especially finish_reason which is
-    required for AG-UI to properly close text messages).
-    
-    NOTE: This function is currently unused - the DeduplicatingOrchestrator
-    handles deduplication at the event level instead.
-    """
-    seen_tool_call_ids: set[str] = set()
-    last_response_id: str | None = None
-    
-    async for update in stream:
-        # Track the response_id for thread mapping
-        if update.response_id:
-            last_response_id = update.response_id
-        if update.conversation_id:
-            last_response_id = update.conversation_id
-        
-        # Filter out duplicate tool calls from contents
-        if update.contents:
-            filtered_contents = []
-            has_duplicates = False
-            
-            for content in update.contents:
-                if isinstance(content, FunctionCallContent):
-                    call_id = content.call_id
-                    if call_id and call_id in seen_tool_call_ids:
-                        logger.debug("[Dedup] Filtering duplicate tool call: %s", call_id)
-                        has_duplicates = True
-                        continue
-                    if call_id:
-                        seen_tool_call_ids.add(call_id)
-                filtered_contents.append(content)
-            
-            # Only modify the update if we actually filtered something
-            if has_duplicates:
-                # If no contents left but update has important metadata, still yield it
-                # (finish_reason is critical for AG-UI to close text messages properly)
-                if not filtered_contents and not update.finish_reason:
-                    continue
-                
-                # Create new update with filtered contents
-                update = ChatResponseUpdate(
-                    role=update.role,
-                    contents=filtered_contents if filtered_contents else None,
-                    response_id=update.response_id,
-                    conversation_id=update.conversation_id,
-                    message_id=update.message_id,
-                    model_id=update.model_id,
-                    finish_reason=update.finish_reason,
-                    raw_representation=update.raw_representation,
-                    created_at=update.created_at,
-                    author_name=update.author_name,
-                    additional_properties=update.additional_properties,
-                )
-        
-        yield update
-    
-    # After streaming completes, store the response_id for thread mapping
-    if agui_thread_id and last_response_id:
-        if last_response_id.startswith(("resp_", "conv_")):
-            _thread_response_store[agui_thread_id] = last_response_id
-            logger.debug("[Dedup] Stored response_id %s for thread %s", last_response_id, agui_thread_id)
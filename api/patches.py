@@ -16,6 +16,7 @@ Current patches:
 import copy
 import json
 import logging
+import sys
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -31,10 +32,19 @@ logger = logging.getLogger(__name__)
 # Related: https://github.com/pydantic/pydantic/issues/12704
 # ============================================================================
 
+# The patch only helps if it lands before openai._models builds its schemas, so we
+# never force a re-import of that (large) module - we just warn if we're too late.
+if "openai._models" in sys.modules:
+    logger.warning(
+        "openai._models was imported before patches.py; "
+        "the HttpxRequestFiles workaround may not take effect"
+    )
+
 try:
     import openai._types
-    openai._types.HttpxRequestFiles = Any  # type: ignore[attr-defined]
-    logger.debug("Applied pydantic SchemaError workaround for openai._types.HttpxRequestFiles")
+    if openai._types.HttpxRequestFiles is not Any:  # type: ignore[attr-defined]
+        openai._types.HttpxRequestFiles = Any  # type: ignore[attr-defined]
+        logger.debug("Applied pydantic SchemaError workaround for openai._types.HttpxRequestFiles")
 except (ImportError, AttributeError) as e:
     logger.warning("Failed to apply pydantic workaround: %s", e)
 
@@ -55,6 +65,21 @@ _original_deepcopy = copy.deepcopy
 # Track objects that failed deepcopy to skip them in future attempts
 _uncopyable_ids: set[int] = set()
 
+# Immutable scalars deepcopy returns unchanged; short-circuit them before any other work.
+# frozenset is left out on purpose - deepcopy rebuilds it element by element.
+_ATOMIC_TYPES = frozenset({type(None), bool, int, float, complex, str, bytes})
+
+
+def _seeded_memo() -> dict:
+    """Create a deepcopy memo with its keep-alive list already in place.
+    
+    copy.deepcopy stores a keep-alive list under memo[id(memo)] and creates it
+    lazily via a caught KeyError; seeding it skips that exception on every copy.
+    """
+    memo: dict = {}
+    memo[id(memo)] = []
+    return memo
+
 
 def _safe_deepcopy(obj: Any, memo: dict | None = None) -> Any:
     """Safe deepcopy wrapper that handles RLock errors from Azure credentials.
@@ -62,12 +87,17 @@ def _safe_deepcopy(obj: Any, memo: dict | None = None) -> Any:
     When deepcopy fails on an object with RLock, we mark that object and return
     the original (shallow reference). This preserves tools and other complex objects.
     """
+    # Atomics (and the empty tuple) copy to themselves
+    cls = type(obj)
+    if cls in _ATOMIC_TYPES or (cls is tuple and not obj):
+        return obj
+    
     # If this exact object failed before, return it as-is
     if id(obj) in _uncopyable_ids:
         return obj
     
     try:
-        return _original_deepcopy(obj, memo)
+        return _original_deepcopy(obj, memo if memo is not None else _seeded_memo())
     except TypeError as e:
         if "RLock" in str(e) or "cannot pickle" in str(e):
             # Mark this object as uncopyable for future calls
@@ -76,7 +106,7 @@ def _safe_deepcopy(obj: Any, memo: dict | None = None) -> Any:
             # For dicts, try to copy what we can, keeping references to uncopyable items
             if isinstance(obj, dict):
                 if memo is None:
-                    memo = {}
+                    memo = _seeded_memo()
                 result = {}
                 for k, v in obj.items():
                     try:
@@ -110,6 +140,14 @@ def apply_deepcopy_patch() -> None:
     except (ImportError, AttributeError):
         pass
 
+    # Agent option snapshots can hold tools bound to credentialed clients
+    try:
+        import agent_framework._agents as _agents_module
+        _agents_module.deepcopy = _safe_deepcopy
+        logger.debug("Patched agent_framework._agents.deepcopy")
+    except (ImportError, AttributeError):
+        pass
+
     try:
         import agent_framework_ag_ui._utils as _utils_module
         _utils_module.copy.deepcopy = _safe_deepcopy